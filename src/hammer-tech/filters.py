@@ -8,8 +8,10 @@
 
 import os
 import warnings
-from typing import TYPE_CHECKING, Any, Callable, List
+from collections import OrderedDict
+from typing import TYPE_CHECKING, Any, Callable, Dict, Iterable, List, Tuple
 
+from hammer_utils import cached_property
 from library_filter import LibraryFilter
 
 if TYPE_CHECKING:
@@ -17,256 +19,333 @@ if TYPE_CHECKING:
     from library_filter import Library
 
 
+# Only emit the liberty_lib_filter deprecation warning once per process.
+_liberty_lib_filter_warned = False
+
+
+# Attributes to try in order of preference for each filter.
+_TIMING_DB_PRIORITY = ("ccs_library_file", "nldm_library_file")
+_TIMING_LIB_PRIORITY = ("ccs_liberty_file", "nldm_liberty_file")
+_TIMING_LIB_WITH_ECSM_PRIORITY = ("ecsm_liberty_file", "ccs_liberty_file", "nldm_liberty_file")
+
+
+def _first_present(lib: "Library", attrs: Tuple[str, ...]) -> List[str]:
+    """
+    Get the first of the given attributes which is set (not None) in the given library.
+    :param lib: Library to look in.
+    :param attrs: Attribute names in order of preference.
+    :return: Single-element list with the first set attribute, or an empty list if none of them are set.
+    """
+    for attr in attrs:
+        value = getattr(lib, attr)
+        if value is not None:
+            return [value]
+    return []
+
+
+def _timing_db_paths(lib: "Library") -> List[str]:
+    return _first_present(lib, _TIMING_DB_PRIORITY)
+
+
+def _timing_lib_paths(lib: "Library") -> List[str]:
+    return _first_present(lib, _TIMING_LIB_PRIORITY)
+
+
+def _timing_lib_with_ecsm_paths(lib: "Library") -> List[str]:
+    return _first_present(lib, _TIMING_LIB_WITH_ECSM_PRIORITY)
+
+
+def _qrc_tech_paths(lib: "Library") -> List[str]:
+    if lib.qrc_techfile is not None:
+        return [lib.qrc_techfile]
+    else:
+        return []
+
+
+def _verilog_synth_paths(lib: "Library") -> List[str]:
+    if lib.verilog_synth is not None:
+        return [lib.verilog_synth]
+    else:
+        return []
+
+
+def _lef_filter_func(lib: "Library") -> bool:
+    return lib.lef_file is not None
+
+
+def _lef_paths(lib: "Library") -> List[str]:
+    assert lib.lef_file is not None
+    return [lib.lef_file]
+
+
+def _lef_sort_func(lib: "Library"):
+    provides = lib.provides
+    if provides is not None and any(provided.lib_type == "technology" for provided in provides):
+        return 0  # put the technology LEF in front
+    return 100  # put it behind
+
+
+def _verilog_sim_filter_func(lib: "Library") -> bool:
+    return lib.verilog_sim is not None
+
+
+def _verilog_sim_paths(lib: "Library") -> List[str]:
+    assert lib.verilog_sim is not None
+    return [lib.verilog_sim]
+
+
+def _gds_filter_func(lib: "Library") -> bool:
+    return lib.gds_file is not None
+
+
+def _gds_paths(lib: "Library") -> List[str]:
+    assert lib.gds_file is not None
+    return [lib.gds_file]
+
+
+def _spice_filter_func(lib: "Library") -> bool:
+    return lib.spice_file is not None
+
+
+def _spice_paths(lib: "Library") -> List[str]:
+    assert lib.spice_file is not None
+    return [lib.spice_file]
+
+
+def _milkyway_lib_dir_paths(lib: "Library") -> List[str]:
+    if lib.milkyway_lib_in_dir is not None:
+        return [os.path.dirname(lib.milkyway_lib_in_dir)]
+    else:
+        return []
+
+
+def _milkyway_techfile_paths(lib: "Library") -> List[str]:
+    if lib.milkyway_techfile is not None:
+        return [lib.milkyway_techfile]
+    else:
+        return []
+
+
+def _tlu_max_cap_paths(lib: "Library") -> List[str]:
+    if lib.tluplus_files is not None and lib.tluplus_files.max_cap is not None:
+        return [lib.tluplus_files.max_cap]
+    else:
+        return []
+
+
+def _tlu_min_cap_paths(lib: "Library") -> List[str]:
+    if lib.tluplus_files is not None and lib.tluplus_files.min_cap is not None:
+        return [lib.tluplus_files.min_cap]
+    else:
+        return []
+
+
+def _tlu_map_file_paths(lib: "Library") -> List[str]:
+    if lib.tluplus_map_file is not None:
+        return [lib.tluplus_map_file]
+    else:
+        return []
+
+
+class _NonEmptyCheck:
+    """
+    List-level post filter function which checks that the list it is given has at least one element.
+    See LibraryFilterHolder.create_nonempty_check.
+    """
+    __slots__ = ('description',)
+
+    def __init__(self, description: str) -> None:
+        self.description = description
+
+    def __call__(self, l: List[str]) -> List[str]:
+        if len(l) == 0:
+            raise ValueError("Must have at least one " + self.description)
+        else:
+            return l
+
+
+_MILKYWAY_TECHFILE_CHECK = _NonEmptyCheck("Milkyway techfile")
+
+
 class LibraryFilterHolder:
     """
     Dummy class to hold the list of properties.
     Instantiated by hammer_tech to be exposed as hammer_tech.filters.lef_filter etc.
+    Each filter is only constructed once per holder since the filters do not depend on any state.
     """
 
     @staticmethod
     def create_nonempty_check(description: str) -> Callable[[List[str]], List[str]]:
         """
-        Create a function that checks that the list it is given has >1 element.
+        Create a function that checks that the list it is given has at least one element.
         :param description: Description to show in the error message.
         :return: Function that takes in the list of elements and returns a checked/processed version of itself.
         """
-        def check_nonempty(l: List[str]) -> List[str]:
-            if len(l) == 0:
-                raise ValueError("Must have at least one " + description)
-            else:
-                return l
+        return _NonEmptyCheck(description)
 
-        return check_nonempty
+    @staticmethod
+    def evaluate_filters(libs: Iterable["Library"],
+                         filts: List[LibraryFilter]) -> List[List[Tuple["Library", List[str]]]]:
+        """
+        Evaluate several filters against the given libraries in a single pass.
+        Each library is visited once and every given filter is run on it, instead of walking the whole list of
+        libraries once per filter.
+        This only applies filter_func, sort_func and paths_func; see HammerTechnology.process_library_filter for
+        the rest of the processing.
+
+        :param libs: Libraries to evaluate the filters against.
+        :param filts: Filters to evaluate.
+        :return: For each of the given filters in order, the selected libraries (sorted with the filter's sort_func,
+                 if any) and the library-relative paths from each of them.
+        """
+        matching_libs = [[] for _ in filts]  # type: List[List[Library]]
+        for lib in libs:
+            for filt, filt_libs in zip(filts, matching_libs):
+                if filt.filter_func is None or filt.filter_func(lib):
+                    filt_libs.append(lib)
+
+        results = []  # type: List[List[Tuple[Library, List[str]]]]
+        for filt, filt_libs in zip(filts, matching_libs):
+            if filt.sort_func is not None:
+                filt_libs = sorted(filt_libs, key=filt.sort_func)
+            results.append([(lib, filt.paths_func(lib)) for lib in filt_libs])
+        return results
+
+    def evaluate_all(self, libs: Iterable["Library"], filter_names: Iterable[str]) -> Dict[str, List[str]]:
+        """
+        Evaluate several of the filters in this holder against the given libraries in a single pass.
+        See evaluate_filters.
 
-    @property
+        :param libs: Libraries to evaluate the filters against.
+        :param filter_names: Names of the filters to evaluate (e.g. "lef_filter").
+        :return: Dictionary of filter name to the library-relative paths selected by that filter, in the same
+                 order that process_library_filter would use.
+        """
+        selected = OrderedDict()  # type: Dict[str, LibraryFilter]
+        for name in filter_names:
+            if name in selected:
+                # Only evaluate each filter once even if it is requested several times.
+                continue
+            filt = getattr(self, name, None)
+            if not isinstance(filt, LibraryFilter):
+                raise ValueError("{name} is not a pre-implemented LibraryFilter".format(name=name))
+            selected[name] = filt
+
+        results = OrderedDict()  # type: Dict[str, List[str]]
+        for name, libs_and_paths in zip(selected.keys(), self.evaluate_filters(libs, list(selected.values()))):
+            results[name] = [path for _, paths in libs_and_paths for path in paths]
+        return results
+
+    @cached_property
     def timing_db_filter(self) -> LibraryFilter:
         """
         Selecting Synopsys timing libraries (.db). Prefers CCS if available; picks NLDM as a fallback.
         """
-
-        def paths_func(lib: "Library") -> List[str]:
-            # Choose ccs if available, if not, nldm.
-            if lib.ccs_library_file is not None:
-                return [lib.ccs_library_file]
-            elif lib.nldm_library_file is not None:
-                return [lib.nldm_library_file]
-            else:
-                return []
-
-        return LibraryFilter.new("timing_db", "CCS/NLDM timing lib (Synopsys .db)", paths_func=paths_func,
+        return LibraryFilter.new("timing_db", "CCS/NLDM timing lib (Synopsys .db)", paths_func=_timing_db_paths,
                                  is_file=True)
 
-    @property
+    @cached_property
     def liberty_lib_filter(self) -> LibraryFilter:
         """
         Select ASCII liberty (.lib) timing libraries. Prefers CCS if available; picks NLDM as a fallback.
         """
-        warnings.warn("Use timing_lib_filter instead", DeprecationWarning, stacklevel=2)
+        global _liberty_lib_filter_warned
+        if not _liberty_lib_filter_warned:
+            # stacklevel=3 to skip over cached_property.__get__.
+            warnings.warn("Use timing_lib_filter instead", DeprecationWarning, stacklevel=3)
+            _liberty_lib_filter_warned = True
 
-        def paths_func(lib: "Library") -> List[str]:
-            # Choose ccs if available, if not, nldm.
-            if lib.ccs_liberty_file is not None:
-                return [lib.ccs_liberty_file]
-            elif lib.nldm_liberty_file is not None:
-                return [lib.nldm_liberty_file]
-            else:
-                return []
+        # Identical to timing_lib_filter.
+        return self.timing_lib_filter
 
-        return LibraryFilter.new("timing_lib", "CCS/NLDM timing lib (ASCII .lib)",
-                                 paths_func=paths_func, is_file=True)
-
-    @property
+    @cached_property
     def timing_lib_filter(self) -> LibraryFilter:
         """
         Select ASCII .lib timing libraries. Prefers CCS if available; picks NLDM as a fallback.
         """
-
-        def paths_func(lib: "Library") -> List[str]:
-            # Choose ccs if available, if not, nldm.
-            if lib.ccs_liberty_file is not None:
-                return [lib.ccs_liberty_file]
-            elif lib.nldm_liberty_file is not None:
-                return [lib.nldm_liberty_file]
-            else:
-                return []
-
         return LibraryFilter.new("timing_lib", "CCS/NLDM timing lib (ASCII .lib)",
-                                 paths_func=paths_func, is_file=True)
+                                 paths_func=_timing_lib_paths, is_file=True)
 
-    @property
+    @cached_property
     def timing_lib_with_ecsm_filter(self) -> LibraryFilter:
         """
         Select ASCII .lib timing libraries. Prefers ECSM, then CCS, then NLDM if multiple are present for
         a single given .lib.
         """
-
-        def paths_func(lib: "Library") -> List[str]:
-            if lib.ecsm_liberty_file is not None:
-                return [lib.ecsm_liberty_file]
-            elif lib.ccs_liberty_file is not None:
-                return [lib.ccs_liberty_file]
-            elif lib.nldm_liberty_file is not None:
-                return [lib.nldm_liberty_file]
-            else:
-                return []
-
         return LibraryFilter.new("timing_lib_with_ecsm", "ECSM/CCS/NLDM timing lib (liberty ASCII .lib)",
-                                 paths_func=paths_func, is_file=True)
+                                 paths_func=_timing_lib_with_ecsm_paths, is_file=True)
 
-    @property
+    @cached_property
     def qrc_tech_filter(self) -> LibraryFilter:
         """
         Selecting qrc RC Corner tech (qrcTech) files.
         """
-
-        def paths_func(lib: "Library") -> List[str]:
-            if lib.qrc_techfile is not None:
-                return [lib.qrc_techfile]
-            else:
-                return []
-
         return LibraryFilter.new("qrc", "qrc RC corner tech file",
-                                 paths_func=paths_func, is_file=True)
+                                 paths_func=_qrc_tech_paths, is_file=True)
 
-    @property
+    @cached_property
     def verilog_synth_filter(self) -> LibraryFilter:
         """
         Selecting verilog_synth files which are synthesizable wrappers (e.g. for SRAM) which are needed in some
         technologies.
         """
-
-        def paths_func(lib: "Library") -> List[str]:
-            if lib.verilog_synth is not None:
-                return [lib.verilog_synth]
-            else:
-                return []
-
         return LibraryFilter.new("verilog_synth", "Synthesizable Verilog wrappers",
-                                 paths_func=paths_func, is_file=True)
+                                 paths_func=_verilog_synth_paths, is_file=True)
 
-    @property
+    @cached_property
     def lef_filter(self) -> LibraryFilter:
         """
         Select LEF files for physical layout.
         """
+        return LibraryFilter.new("lef", "LEF physical design layout library", is_file=True,
+                                 filter_func=_lef_filter_func, paths_func=_lef_paths, sort_func=_lef_sort_func)
 
-        def filter_func(lib: "Library") -> bool:
-            return lib.lef_file is not None
-
-        def paths_func(lib: "Library") -> List[str]:
-            assert lib.lef_file is not None
-            return [lib.lef_file]
-
-        def sort_func(lib: "Library"):
-            if lib.provides is not None:
-                for provided in lib.provides:
-                    if provided.lib_type is not None and provided.lib_type == "technology":
-                        return 0  # put the technology LEF in front
-            return 100  # put it behind
-
-        return LibraryFilter.new("lef", "LEF physical design layout library", is_file=True, filter_func=filter_func,
-                                 paths_func=paths_func, sort_func=sort_func)
-
-    @property
+    @cached_property
     def verilog_sim_filter(self) -> LibraryFilter:
         """
         Select verilog sim files for gate level simulation
         """
+        return LibraryFilter.new("verilog_sim", "Gate-level verilog sources", is_file=True,
+                                 filter_func=_verilog_sim_filter_func, paths_func=_verilog_sim_paths)
 
-        def filter_func(lib: "Library") -> bool:
-            return lib.verilog_sim is not None
-
-        def paths_func(lib: "Library") -> List[str]:
-            assert lib.verilog_sim is not None
-            return [lib.verilog_sim]
-
-        return LibraryFilter.new("verilog_sim", "Gate-level verilog sources", is_file=True, filter_func=filter_func, paths_func=paths_func)
-
-    @property
+    @cached_property
     def gds_filter(self) -> LibraryFilter:
         """
         Select GDS files for opaque physical information.
         """
+        return LibraryFilter.new("gds", "GDS opaque physical design layout", is_file=True,
+                                 filter_func=_gds_filter_func, paths_func=_gds_paths)
 
-        def filter_func(lib: "Library") -> bool:
-            return lib.gds_file is not None
-
-        def paths_func(lib: "Library") -> List[str]:
-            assert lib.gds_file is not None
-            return [lib.gds_file]
-
-        return LibraryFilter.new("gds", "GDS opaque physical design layout", is_file=True, filter_func=filter_func,
-                                 paths_func=paths_func)
-
-    @property
+    @cached_property
     def spice_filter(self) -> LibraryFilter:
         """
         Select SPICE files.
         """
+        return LibraryFilter.new("spice", "SPICE files", is_file=True,
+                                 filter_func=_spice_filter_func, paths_func=_spice_paths)
 
-        def filter_func(lib: "Library") -> bool:
-            return lib.spice_file is not None
-
-        def paths_func(lib: "Library") -> List[str]:
-            assert lib.spice_file is not None
-            return [lib.spice_file]
-
-        return LibraryFilter.new("spice", "SPICE files", is_file=True, filter_func=filter_func,
-                                 paths_func=paths_func)
-
-    @property
+    @cached_property
     def milkyway_lib_dir_filter(self) -> LibraryFilter:
-        def select_milkyway_lib(lib: "Library") -> List[str]:
-            if lib.milkyway_lib_in_dir is not None:
-                return [os.path.dirname(lib.milkyway_lib_in_dir)]
-            else:
-                return []
-
-        return LibraryFilter.new("milkyway_dir", "Milkyway lib", is_file=False, paths_func=select_milkyway_lib)
+        return LibraryFilter.new("milkyway_dir", "Milkyway lib", is_file=False, paths_func=_milkyway_lib_dir_paths)
 
-    @property
+    @cached_property
     def milkyway_techfile_filter(self) -> LibraryFilter:
         """Select milkyway techfiles."""
+        return LibraryFilter.new("milkyway_tf", "Milkyway techfile", is_file=True,
+                                 paths_func=_milkyway_techfile_paths,
+                                 extra_post_filter_funcs=[_MILKYWAY_TECHFILE_CHECK])
 
-        def select_milkyway_tfs(lib: "Library") -> List[str]:
-            if lib.milkyway_techfile is not None:
-                return [lib.milkyway_techfile]
-            else:
-                return []
-
-        return LibraryFilter.new("milkyway_tf", "Milkyway techfile", is_file=True, paths_func=select_milkyway_tfs,
-                                 extra_post_filter_funcs=[self.create_nonempty_check("Milkyway techfile")])
-
-    @property
+    @cached_property
     def tlu_max_cap_filter(self) -> LibraryFilter:
         """Select TLU+ max cap files."""
+        return LibraryFilter.new("tlu_max", "TLU+ max cap db", is_file=True, paths_func=_tlu_max_cap_paths)
 
-        def select_tlu_max_cap(lib: "Library") -> List[str]:
-            if lib.tluplus_files is not None and lib.tluplus_files.max_cap is not None:
-                return [lib.tluplus_files.max_cap]
-            else:
-                return []
-
-        return LibraryFilter.new("tlu_max", "TLU+ max cap db", is_file=True, paths_func=select_tlu_max_cap)
-
-    @property
+    @cached_property
     def tlu_min_cap_filter(self) -> LibraryFilter:
         """Select TLU+ min cap files."""
+        return LibraryFilter.new("tlu_min", "TLU+ min cap db", is_file=True, paths_func=_tlu_min_cap_paths)
 
-        def select_tlu_min_cap(lib: "Library") -> List[str]:
-            if lib.tluplus_files is not None and lib.tluplus_files.min_cap is not None:
-                return [lib.tluplus_files.min_cap]
-            else:
-                return []
-
-        return LibraryFilter.new("tlu_min", "TLU+ min cap db", is_file=True, paths_func=select_tlu_min_cap)
-
-    @property
+    @cached_property
     def tlu_map_file_filter(self) -> LibraryFilter:
         """Select TLU+ map files."""
-        def select_tlu_map_file(lib: "Library") -> List[str]:
-            if lib.tluplus_map_file is not None:
-                return [lib.tluplus_map_file]
-            else:
-                return []
-        return LibraryFilter.new("tlu_map", "TLU+ map file", is_file=True, paths_func=select_tlu_map_file)
+        return LibraryFilter.new("tlu_map", "TLU+ map file", is_file=True, paths_func=_tlu_map_file_paths)
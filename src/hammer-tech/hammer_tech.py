@@ -8,11 +8,13 @@
 
 import json
 import os
+import pkgutil
 import sys
 import tarfile
 import importlib
 from abc import ABCMeta, abstractmethod
-from typing import Any, Callable, Iterable, List, NamedTuple, Optional, Tuple, Dict, TYPE_CHECKING
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Iterable, List, NamedTuple, Optional, Set, Tuple, Dict, TYPE_CHECKING
 from decimal import Decimal
 
 import hammer_config
@@ -35,7 +37,18 @@ from specialcells import CellType, SpecialCell
 # Access it like hammer_tech.filters.lef_filter
 filters = LibraryFilterHolder()
 
-builder = python_jsonschema_objects.ObjectBuilder(json.loads(open(os.path.dirname(__file__) + "/schema.json").read()))
+# The schema classes are deliberately built eagerly, once per process:
+# - Library is used at import time below (annotations, NamedTuple fields, _add_extra_prefixes()), so it cannot be
+#   deferred with a module-level __getattr__ (which would also require Python 3.7+).
+# - The classes are generated dynamically and are not importable by name, so they cannot be pickled to an on-disk
+#   cache either.
+# Load the schema through the module loader rather than a path relative to __file__ so that this also works when
+# hammer is run from a zip bundle.
+_schema_data = pkgutil.get_data(__name__, "schema.json")
+if _schema_data is None:
+    raise ImportError("Unable to load the hammer-tech schema.json")
+builder = python_jsonschema_objects.ObjectBuilder(json.loads(_schema_data.decode("utf-8")))
+del _schema_data
 ns = builder.build_classes()
 
 # Pull definitions from the autoconstructed classes.
@@ -326,15 +339,15 @@ class HammerTechnology:
 
         :return: Path to the location of the cache dir.
         """
-        try:
-            return self._cachedir
-        except AttributeError:
+        cachedir = self._cachedir
+        if cachedir is None:
             raise ValueError("Internal error: cache dir location not set by hammer-vlsi")
+        return cachedir
 
     @cache_dir.setter
     def cache_dir(self, value: str) -> None:
         """Set the directory as a persistent cache dir for this library."""
-        self._cachedir = value  # type: str
+        self._cachedir = value
         # Ensure the cache_dir exists.
         os.makedirs(value, mode=0o700, exist_ok=True)
 
@@ -365,6 +378,10 @@ class HammerTechnology:
         # Configuration
         self.config = None  # type: TechJSON
 
+        # Set by hammer-vlsi via set_database() and the cache_dir setter.
+        self._database = None  # type: Optional[hammer_config.HammerDatabase]
+        self._cachedir = None  # type: Optional[str]
+
     @classmethod
     def load_from_dir(cls, technology_name: str, path: str) -> Optional["HammerTechnology"]:
         """Load a technology from a given folder.
@@ -375,16 +392,21 @@ class HammerTechnology:
         """
         json_path = os.path.join(path, "%s.tech.json" % technology_name)
         yaml_path = os.path.join(path, "%s.tech.yml" % technology_name)
-        if os.path.exists(json_path):
+        # Just try to open the files instead of checking if they exist first.
+        try:
             with open(json_path) as f:
                 json_str = f.read()
-                return HammerTechnology.load_from_json(technology_name, json_str, path)
-        elif os.path.exists(yaml_path):
+        except FileNotFoundError:
+            pass
+        else:
+            return HammerTechnology.load_from_json(technology_name, json_str, path)
+        try:
             with open(yaml_path) as f:
                 yaml_str = f.read()
-                return HammerTechnology.load_from_yaml(technology_name, yaml_str, path)
-        else:
+        except FileNotFoundError:
             return None
+        else:
+            return HammerTechnology.load_from_yaml(technology_name, yaml_str, path)
 
     @classmethod
     def load_from_json(cls, technology_name: str, json_str: str, path: str) -> "HammerTechnology":
@@ -432,24 +454,27 @@ class HammerTechnology:
 
     def set_database(self, database: hammer_config.HammerDatabase) -> None:
         """Set the settings database for use by the tool."""
-        self._database = database  # type: hammer_config.HammerDatabase
+        self._database = database
 
     def is_database_set(self) -> bool:
         """Return True if the settings database has been set for use by the tool."""
-        return hasattr(self, "_database")
+        return self._database is not None
 
     def get_setting(self, key: str) -> Any:
         """Get a particular setting from the database.
         """
-        try:
-            return self._database.get(key)
-        except AttributeError:
+        database = self._database
+        if database is None:
             raise ValueError("Internal error: no database set by hammer-vlsi")
+        return database.get(key)
 
     def has_setting(self, key: str) -> bool:
         """Check if a setting exists in the database.
         """
-        return self._database.has_setting(key)
+        database = self._database
+        if database is None:
+            raise ValueError("Internal error: no database set by hammer-vlsi")
+        return database.has_setting(key)
 
     def get_config(self) -> List[dict]:
         """Get the hammer configuration for this technology. Not to be confused with the ".tech.json" which self.config refers to."""
@@ -719,32 +744,111 @@ class HammerTechnology:
 
     def extract_tarballs(self) -> None:
         """Extract tarballs to the given cache_dir, or verify that they've been extracted."""
+        # List each parent folder once instead of checking every target folder individually.
+        existing_dirs = {}  # type: Dict[str, Set[str]]
+
+        def is_extracted(target_path: str) -> bool:
+            parent, name = os.path.split(target_path)
+            if parent not in existing_dirs:
+                try:
+                    existing_dirs[parent] = {entry.name for entry in os.scandir(parent) if entry.is_dir()}
+                except (FileNotFoundError, NotADirectoryError):
+                    existing_dirs[parent] = set()
+            return name in existing_dirs[parent]
+
+        def mark_extracted(target_path: str) -> None:
+            parent, name = os.path.split(target_path)
+            existing_dirs.setdefault(parent, set()).add(name)
+
+        # Most tarballs share a base var, so only look each one up once.
+        base_var_paths = {}  # type: Dict[str, str]
         for tarball in self.config.tarballs:
-            target_path = os.path.join(self.extracted_tarballs_dir, tarball.path)
-            tarball_path = os.path.join(self.get_setting(tarball.base_var), tarball.path)
+            base_var = str(tarball.base_var)
+            if base_var not in base_var_paths:
+                base_var_paths[base_var] = self.get_setting(base_var)
+
+        extracted_tarballs_dir = self.extracted_tarballs_dir
+        to_extract = []  # type: List[Tuple[str, str]]
+        for tarball in self.config.tarballs:
+            target_path = os.path.join(extracted_tarballs_dir, tarball.path)
+            tarball_path = os.path.join(base_var_paths[str(tarball.base_var)], tarball.path)
             if not os.path.isfile(tarball_path):
                 raise ValueError("Path {0} does not point to a valid tarball!".format(tarball_path))
-            if os.path.isdir(target_path):
+            if is_extracted(target_path):
                 # If the folder already seems to exist, continue
                 continue
             else:
-                # Else, extract the tarballs.
-                os.makedirs(target_path, mode=0o700, exist_ok=True)  # Make sure it exists or tar will not be happy.
+                # Else, queue the tarball for extraction.
+                mark_extracted(target_path)
+                to_extract.append((tarball_path, target_path))
+
+        while len(to_extract) > 0:
+            # A target inside another queued target might be provided by the enclosing tarball, so only extract it
+            # after the enclosing tarball is done.
+            queued_targets = [target_path for _, target_path in to_extract]
+            this_round = []  # type: List[Tuple[str, str]]
+            deferred = []  # type: List[Tuple[str, str]]
+            for work in to_extract:
+                if any(work[1].startswith(other + os.sep) for other in queued_targets):
+                    deferred.append(work)
+                else:
+                    this_round.append(work)
+
+            for tarball_path, _ in this_round:
                 self.logger.debug("Extracting/verifying tarball %s" % (tarball_path))
-                tarfile.open(tarball_path).extractall(target_path)
-                for root, dirs, files in os.walk(target_path):
-                    for d in dirs:
-                        os.chmod(os.path.join(root, d), mode=0o700)
-                    for f in files:
-                        file = os.path.join(root, f)
-                        os.chmod(file, mode=0o700)
-                        # extract tarball recursively
-                        if tarfile.is_tarfile(file):
-                            self.logger.debug("Extracting/verifying tarball %s" % (file))
-                            tarfile.open(file).extractall(path=os.path.join(root, f + "_dir"))
-                            os.remove(file)
-                            os.renames(os.path.join(root, f + "_dir"), file)
+            # Extraction is mostly disk I/O and decompression, both of which release the GIL,
+            # so extract the tarballs in parallel.
+            with ThreadPoolExecutor(max_workers=min(8, len(this_round))) as executor:
+                futures = [executor.submit(self._extract_tarball, *work) for work in this_round]
+            # Run the post-install script for every tarball that was extracted before reporting any failure.
+            first_error = None  # type: Optional[BaseException]
+            for future in futures:
+                error = future.exception()
+                if error is not None:
+                    if first_error is None:
+                        first_error = error
+                    continue
+                for file in future.result():
+                    self.logger.debug("Extracted/verified nested tarball %s" % (file))
                 self.post_install_script()
+            if first_error is not None:
+                raise first_error
+
+            to_extract = [work for work in deferred if not os.path.isdir(work[1])]
+
+    @staticmethod
+    def _extract_tarball(tarball_path: str, target_path: str) -> List[str]:
+        """
+        Extract the given tarball (and any tarballs inside it) to target_path.
+        Called from worker threads by extract_tarballs(), so this must not log.
+
+        :param tarball_path: Path to the tarball to extract.
+        :param target_path: Folder to extract the tarball into.
+        :return: List of nested tarballs which were also extracted.
+        """
+        os.makedirs(target_path, mode=0o700, exist_ok=True)  # Make sure it exists or tar will not be happy.
+        with tarfile.open(tarball_path) as tf:
+            # Have tarfile apply the desired permissions as it extracts instead of chmod-ing every file afterwards.
+            members = tf.getmembers()
+            for member in members:
+                if member.isfile() or member.isdir():
+                    member.mode = 0o700
+            tf.extractall(target_path, members=members)
+        nested = []  # type: List[str]
+        for root, dirs, files in os.walk(target_path):
+            # Parent folders which are not members of the tarball are not covered above.
+            for d in dirs:
+                os.chmod(os.path.join(root, d), mode=0o700)
+            for f in files:
+                file = os.path.join(root, f)
+                # extract tarball recursively
+                if tarfile.is_tarfile(file):
+                    with tarfile.open(file) as tf:
+                        tf.extractall(path=os.path.join(root, f + "_dir"))
+                    os.remove(file)
+                    os.renames(os.path.join(root, f + "_dir"), file)
+                    nested.append(file)
+        return nested
 
     def post_install_script(self) -> None:
         """a script to apply any needed hotfixes to technology libraries, tech __init__.py will override this"""
@@ -799,26 +903,43 @@ class HammerTechnology:
         :return: Resultant items from the filter and post-processed. (e.g. --timing foo.db --timing bar.db)
         """
 
-        # First, filter the list of available libraries with pre_filts and the library itself.
-        lib_filters = pre_filts + get_or_else(optional_map(filt.filter_func, lambda x: [x]), [])
+        # First, filter the list of available libraries with pre_filts, then with the library filter itself and get
+        # the (sorted) libraries and paths.
+        selected = LibraryFilterHolder.evaluate_filters(self._pre_filter_libraries(pre_filts), [filt])[0]
+        return self._process_selected_libraries(filt, selected, output_func, must_exist, uniquify)
 
-        filtered_libs = list(reduce_named(
-            sequence=lib_filters,
+    def _pre_filter_libraries(self, pre_filts: List[Callable[[Library], bool]]) -> List[Library]:
+        """
+        Get the available libraries which pass all of the given pre-filters.
+
+        :param pre_filts: List of functions with which to pre-filter the libraries. Each function must return true
+                          in order for this library to be used.
+        :return: List of available libraries which pass all of pre_filts.
+        """
+        return list(reduce_named(
+            sequence=pre_filts,
             initial=self.get_available_libraries(),
             function=lambda libs, func: filter(func, libs)
-        ))  # type: List[Library]
+        ))
 
-        # Next, sort the list of libraries if a sort function exists.
-        if filt.sort_func is not None:
-            filtered_libs = sorted(filtered_libs, key=filt.sort_func)
+    def _process_selected_libraries(self,
+                                    filt: LibraryFilter,
+                                    selected: List[Tuple[Library, List[str]]],
+                                    output_func: Callable[[str, LibraryFilter], List[str]],
+                                    must_exist: bool,
+                                    uniquify: bool) -> List[str]:
+        """
+        Process the libraries and library-relative paths selected by the given library filter.
+        See process_library_filter.
+        """
 
-        # Next, extract paths and prepend them to get the real paths.
-        def get_and_prepend_path(lib: Library) -> Tuple[Library, List[str]]:
-            paths = filt.paths_func(lib)
-            full_paths = list(map(lambda path: self.prepend_dir_path(path, lib), paths))
+        # Prepend the paths to get the real paths.
+        def prepend_paths(inp: Tuple[Library, List[str]]) -> Tuple[Library, List[str]]:
+            lib = inp[0]  # type: Library
+            full_paths = list(map(lambda path: self.prepend_dir_path(path, lib), inp[1]))
             return lib, full_paths
 
-        libs_and_paths = list(map(get_and_prepend_path, filtered_libs))  # type: List[Tuple[Library, List[str]]]
+        libs_and_paths = list(map(prepend_paths, selected))  # type: List[Tuple[Library, List[str]]]
 
         # Existence checks for paths.
         def check_lib_and_paths(inp: Tuple[Library, List[str]]) -> Tuple[Library, List[str]]:
@@ -889,11 +1010,16 @@ class HammerTechnology:
             assert isinstance(extra_pre_filters, List)
             pre_filts += extra_pre_filters
 
+        # Pre-filter the libraries and run all of the library filters over them in one pass, rather than once per
+        # library filter.
+        filts = list(library_types)
+        selected = LibraryFilterHolder.evaluate_filters(self._pre_filter_libraries(pre_filts), filts)
+
         return reduce_list_str(
             add_lists,
             map(
-                lambda lib: self.process_library_filter(pre_filts=pre_filts, filt=lib, output_func=output_func, must_exist=must_exist),
-                library_types
+                lambda t: self._process_selected_libraries(t[0], t[1], output_func, must_exist, uniquify=True),
+                zip(filts, selected)
             )
         )
 
@@ -12,7 +12,7 @@ import sys
 import os
 import errno
 from functools import reduce
-from typing import List, Any, Set, Dict, Tuple, TypeVar, Callable, Iterable, Optional, Union
+from typing import List, Any, Set, Dict, Tuple, TypeVar, Callable, Iterable, Optional, Union, Generic
 from enum import Enum, unique
 import decimal
 from decimal import Decimal
@@ -254,6 +254,27 @@ def optional_map(optional: Optional[_T], func: Callable[[_T], _U]) -> Optional[_
         return func(optional)
 
 
+class cached_property(Generic[_T]):
+    """
+    Read-only property which is computed on first access and then stored on the instance,
+    so that later accesses are a plain attribute lookup.
+    Stand-in for functools.cached_property, which requires Python 3.8+.
+    Use `del obj.<name>` to force the value to be recomputed.
+    """
+
+    def __init__(self, func: Callable[[Any], _T]) -> None:
+        self.func = func
+        self.attrname = func.__name__
+        self.__doc__ = func.__doc__
+
+    def __get__(self, instance: Any, owner: Any = None) -> _T:
+        if instance is None:
+            return self  # type: ignore
+        value = self.func(instance)
+        instance.__dict__[self.attrname] = value
+        return value
+
+
 def assert_function_type(function: Callable, args: List[type], return_type: type) -> None:
     """
     Assert that the given function obeys its function type signature.
@@ -13,11 +13,13 @@ import os
 import shutil
 import unittest
 import sys
+import warnings
 
 from hammer_vlsi import HammerVLSISettings
 from typing import Any, Dict, List, Optional
 
 from hammer_logging import HammerVLSILogging
+import filters
 import hammer_tech
 from hammer_tech import LibraryFilter, Stackup, Metal, WidthSpacingTuple, SpecialCell, CellType, DRCDeck, LVSDeck
 from hammer_utils import deepdict
@@ -106,6 +108,55 @@ class HammerTechnologyTest(HasGetTech, unittest.TestCase):
         # Cleanup
         shutil.rmtree(tech_dir_base)
 
+    def test_filters_are_cached(self) -> None:
+        """
+        Test that the pre-implemented filters are only constructed once.
+        """
+        self.assertIs(hammer_tech.filters.lef_filter, hammer_tech.filters.lef_filter)
+        self.assertIs(hammer_tech.filters.timing_lib_filter, hammer_tech.filters.timing_lib_filter)
+        self.assertIs(hammer_tech.filters.milkyway_techfile_filter, hammer_tech.filters.milkyway_techfile_filter)
+
+    def test_liberty_lib_filter_warns_once(self) -> None:
+        """
+        Test that the liberty_lib_filter deprecation warning is only emitted once.
+        """
+        filters._liberty_lib_filter_warned = False
+        with warnings.catch_warnings(record=True) as caught:
+            warnings.simplefilter("always")
+            for _ in range(3):
+                holder = filters.LibraryFilterHolder()
+                self.assertEqual(holder.liberty_lib_filter.tag, "timing_lib")
+                self.assertEqual(holder.liberty_lib_filter.tag, "timing_lib")
+        assert caught is not None
+        self.assertEqual(len([w for w in caught if issubclass(w.category, DeprecationWarning)]), 1)
+        self.assertIs(holder.liberty_lib_filter, holder.timing_lib_filter)
+
+    def test_filters_evaluate_all(self) -> None:
+        """
+        Test that several filters can be evaluated against the libraries at once.
+        """
+        libs = [
+            hammer_tech.library_from_json('{"lef file": "test/a.lef", "gds file": "test/a.gds"}'),
+            hammer_tech.library_from_json('{"gds file": "test/b.gds", "spice file": "test/b.sp"}'),
+            hammer_tech.library_from_json('{"lef file": "test/tech.lef", "provides": [{"lib_type": "technology"}]}')
+        ]  # type: List[hammer_tech.Library]
+
+        results = hammer_tech.filters.evaluate_all(libs, ["lef_filter", "gds_filter", "spice_filter"])
+        self.assertEqual(results, {
+            # The technology LEF must come first.
+            "lef_filter": ["test/tech.lef", "test/a.lef"],
+            "gds_filter": ["test/a.gds", "test/b.gds"],
+            "spice_filter": ["test/b.sp"]
+        })
+
+        # Filters requested more than once are only evaluated once.
+        self.assertEqual(hammer_tech.filters.evaluate_all(libs, ["gds_filter", "gds_filter"]), {
+            "gds_filter": ["test/a.gds", "test/b.gds"]
+        })
+
+        with self.assertRaises(ValueError):
+            hammer_tech.filters.evaluate_all(libs, ["create_nonempty_check"])
+
     def test_process_library_filter_removes_duplicates(self) -> None:
         """
         Test that process_library_filter removes duplicates.
@@ -199,6 +250,137 @@ class HammerTechnologyTest(HasGetTech, unittest.TestCase):
         # Cleanup
         shutil.rmtree(tech_dir_base)
 
+    def test_tarballs_partially_failing(self) -> None:
+        """
+        Test that the post-install script still runs for the tarballs that were extracted when another tarball fails.
+        """
+        import hammer_config
+        import tarfile
+
+        tech_dir, tech_dir_base = HammerToolTestHelpers.create_tech_dir("dummy28")
+        tech_json_filename = os.path.join(tech_dir, "dummy28.tech.json")
+
+        # Create one good tarball and one corrupt tarball.
+        gds_filename = os.path.join(tech_dir_base, "test.gds")
+        with open(gds_filename, "w") as f:
+            f.write("gds")
+        with tarfile.open(os.path.join(tech_dir, "good.tar.gz"), "w:gz") as tf:
+            tf.add(gds_filename, arcname="test.gds")
+        with open(os.path.join(tech_dir, "bad.tar.gz"), "w") as f:
+            f.write("not a tarball")
+
+        # Add defaults to specify tarball_dir.
+        with open(os.path.join(tech_dir, "defaults.json"), "w") as f:
+            f.write(json.dumps({
+                "technology.dummy28.tarball_dir": tech_dir
+            }, cls=HammerJSONEncoder))
+
+        def add_tarballs(in_dict: Dict[str, Any]) -> Dict[str, Any]:
+            out_dict = deepdict(in_dict)
+            del out_dict["installs"]
+            out_dict["tarballs"] = [{
+                "path": path,
+                "homepage": "http://www.example.com/tarballs",
+                "base var": "technology.dummy28.tarball_dir"
+            } for path in ("good.tar.gz", "bad.tar.gz")]
+            out_dict["libraries"] = [{
+                "name": "abcdef",
+                "gds file": "good.tar.gz/test.gds"
+            }]
+            return out_dict
+
+        HammerToolTestHelpers.write_tech_json(tech_json_filename, add_tarballs)
+        sys.path.append(tech_dir_base)
+        tech = self.get_tech(hammer_tech.HammerTechnology.load_from_dir("dummy28", tech_dir))
+        tech.cache_dir = tech_dir
+
+        database = hammer_config.HammerDatabase()
+        database.update_technology(tech.get_config())
+        HammerVLSISettings.load_builtins_and_core(database)
+        tech.set_database(database)
+
+        post_installs = []  # type: List[None]
+        setattr(tech, "post_install_script", lambda: post_installs.append(None))
+        with self.assertRaises(tarfile.ReadError):
+            tech.extract_tarballs()
+        self.assertEqual(len(post_installs), 1)
+        self.assertTrue(os.path.isfile("{0}/extracted/good.tar.gz/test.gds".format(tech_dir)))
+
+        # Cleanup
+        shutil.rmtree(tech_dir_base)
+
+    def test_tarballs_nested_targets(self) -> None:
+        """
+        Test that tarballs extracted inside another tarball's folder are only extracted after it, and are skipped if
+        the enclosing tarball already provides them.
+        """
+        import hammer_config
+        import tarfile
+
+        tech_dir, tech_dir_base = HammerToolTestHelpers.create_tech_dir("dummy28")
+        tech_json_filename = os.path.join(tech_dir, "dummy28.tech.json")
+        outer_dir = os.path.join(tech_dir, "outer")
+        inner_dir = os.path.join(tech_dir, "inner")
+        os.makedirs(outer_dir)
+        os.makedirs(os.path.join(inner_dir, "pkg"))
+
+        def make_tarball(tarball_path: str, filename: str) -> None:
+            src_filename = os.path.join(tech_dir_base, os.path.basename(filename))
+            with open(src_filename, "w") as f:
+                f.write(filename)
+            with tarfile.open(tarball_path, "w:gz") as tf:
+                tf.add(src_filename, arcname=filename)
+
+        # The outer "pkg" tarball provides pkg/provided.tar.gz but not pkg/extra.tar.gz.
+        make_tarball(os.path.join(outer_dir, "pkg"), "provided.tar.gz/outer.gds")
+        make_tarball(os.path.join(inner_dir, "pkg", "provided.tar.gz"), "inner.gds")
+        make_tarball(os.path.join(inner_dir, "pkg", "extra.tar.gz"), "extra.gds")
+
+        # Add defaults to specify the tarball dirs.
+        with open(os.path.join(tech_dir, "defaults.json"), "w") as f:
+            f.write(json.dumps({
+                "technology.dummy28.outer_tarball_dir": outer_dir,
+                "technology.dummy28.inner_tarball_dir": inner_dir
+            }, cls=HammerJSONEncoder))
+
+        def add_tarballs(in_dict: Dict[str, Any]) -> Dict[str, Any]:
+            out_dict = deepdict(in_dict)
+            del out_dict["installs"]
+            out_dict["tarballs"] = [{
+                "path": path,
+                "homepage": "http://www.example.com/tarballs",
+                "base var": base_var
+            } for path, base_var in (("pkg/provided.tar.gz", "technology.dummy28.inner_tarball_dir"),
+                                     ("pkg", "technology.dummy28.outer_tarball_dir"),
+                                     ("pkg/extra.tar.gz", "technology.dummy28.inner_tarball_dir"))]
+            out_dict["libraries"] = [{
+                "name": "abcdef",
+                "gds file": "pkg/extra.tar.gz/extra.gds"
+            }]
+            return out_dict
+
+        HammerToolTestHelpers.write_tech_json(tech_json_filename, add_tarballs)
+        sys.path.append(tech_dir_base)
+        tech = self.get_tech(hammer_tech.HammerTechnology.load_from_dir("dummy28", tech_dir))
+        tech.cache_dir = tech_dir
+
+        database = hammer_config.HammerDatabase()
+        database.update_technology(tech.get_config())
+        HammerVLSISettings.load_builtins_and_core(database)
+        tech.set_database(database)
+
+        post_installs = []  # type: List[None]
+        setattr(tech, "post_install_script", lambda: post_installs.append(None))
+        tech.extract_tarballs()
+        self.assertEqual(len(post_installs), 2)
+        extracted_dir = os.path.join(tech_dir, "extracted", "pkg")
+        self.assertTrue(os.path.isfile(os.path.join(extracted_dir, "provided.tar.gz", "outer.gds")))
+        self.assertFalse(os.path.exists(os.path.join(extracted_dir, "provided.tar.gz", "inner.gds")))
+        self.assertTrue(os.path.isfile(os.path.join(extracted_dir, "extra.tar.gz", "extra.gds")))
+
+        # Cleanup
+        shutil.rmtree(tech_dir_base)
+
     def test_tarballs_pre_extracted(self) -> None:
         """
         Test that tarballs that are pre-extracted also work as expected.
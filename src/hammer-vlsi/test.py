@@ -150,6 +150,10 @@ class HammerToolTest(HasGetTech, unittest.TestCase):
                 self._read_lib_output = tech.read_libs([hammer_tech.filters.milkyway_techfile_filter], test_tool_format, must_exist=False)
 
                 self._test_filter_output = tech.read_libs([HammerToolTestHelpers.make_test_filter()], test_tool_format, must_exist=False)
+
+                self._combined_output = tech.read_libs([hammer_tech.filters.milkyway_techfile_filter,
+                                                        HammerToolTestHelpers.make_test_filter()],
+                                                       test_tool_format, must_exist=False)
                 return True
         test = Tool()
         test.logger = HammerVLSILogging.context("")
@@ -172,6 +176,9 @@ class HammerToolTest(HasGetTech, unittest.TestCase):
             "drink {0}/orange".format(tech_dir)
         ])
 
+        # Reading several library types at once is the same as reading them one at a time.
+        self.assertEqual(test._combined_output, test._read_lib_output + test._test_filter_output)
+
         # Cleanup
         shutil.rmtree(tech_dir_base)
         shutil.rmtree(test.run_dir)
@@ -9,7 +9,7 @@ from typing import Dict, Tuple, List, Optional, Union
 from decimal import Decimal
 
 from hammer_utils import (topological_sort, get_or_else, optional_map, assert_function_type, check_function_type,
-                          gcd, lcm, lcm_grid, coerce_to_grid, check_on_grid, um2mm)
+                          gcd, lcm, lcm_grid, coerce_to_grid, check_on_grid, um2mm, cached_property)
 
 import unittest
 
@@ -51,6 +51,29 @@ class UtilsTest(unittest.TestCase):
         self.assertNotEqual(optional_map("88", str_to_num), "880")
         self.assertEqual(optional_map("42", str_to_num), 420)
 
+    def test_cached_property(self) -> None:
+        class Counter:
+            def __init__(self) -> None:
+                self.calls = 0
+
+            @cached_property
+            def value(self) -> int:
+                """Docstring of value."""
+                self.calls += 1
+                return self.calls * 10
+
+        c = Counter()
+        self.assertEqual(c.value, 10)
+        self.assertEqual(c.value, 10)
+        self.assertEqual(c.calls, 1)
+        # Each instance has its own cached value.
+        self.assertEqual(Counter().value, 10)
+        # Deleting the attribute forces a recomputation.
+        del c.value
+        self.assertEqual(c.value, 20)
+        self.assertEqual(c.calls, 2)
+        self.assertEqual(Counter.value.__doc__, "Docstring of value.")
+
     def test_coerce_to_grid(self) -> None:
         self.assertEqual(coerce_to_grid(1.23, Decimal("0.1")), Decimal("1.2"))
         self.assertEqual(coerce_to_grid(1.23, Decimal("0.01")), Decimal("1.23"))